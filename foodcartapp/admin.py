@@ -1,4 +1,7 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Count
 from django.shortcuts import reverse, redirect
 from django.templatetags.static import static
 from django.utils.encoding import iri_to_uri
@@ -6,20 +9,85 @@ from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
 
+from .geocoder import update_restaurants_coordinates
 from .models import Product
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order, OrderQuantity
+from .paginators import EstimatedCountPaginator, PaginatedInlineFormSet
+from .search import search
+from .thumbnails import generate_thumbnails
 
 
-class RestaurantMenuItemInline(admin.TabularInline):
+class SearchBackendMixin:
+    def get_search_results(self, request, queryset, search_term):
+        return search(queryset, self.get_search_fields(request), search_term), False
+
+
+class SelectedObjectAutocompleteSelect(AutocompleteSelect):
+    # Подпись выбранного объекта берётся из select_related, а не отдельным запросом на строку
+    selected_object = None
+
+    def optgroups(self, name, value, attr=None):
+        selected_object = self.selected_object
+        if selected_object is None or set(value) != {str(selected_object.pk)}:
+            return super().optgroups(name, value, attr)
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        label = self.choices.field.label_from_instance(selected_object)
+        default[1].append(
+            self.create_option(name, selected_object.pk, label, True, len(default[1]))
+        )
+        return [default]
+
+
+class SelectRelatedInlineForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field_name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if not isinstance(widget, SelectedObjectAutocompleteSelect):
+                continue
+            if self.instance._meta.get_field(field_name).is_cached(self.instance):
+                widget.selected_object = getattr(self.instance, field_name)
+
+
+class SelectRelatedAutocompleteMixin:
+    form = SelectRelatedInlineForm
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = SelectedObjectAutocompleteSelect(
+                db_field,
+                self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class RestaurantMenuItemInline(SelectRelatedAutocompleteMixin, admin.TabularInline):
     model = RestaurantMenuItem
     extra = 0
+    autocomplete_fields = ['restaurant', 'product']
+    formset = PaginatedInlineFormSet
+    template = 'admin/foodcartapp/edit_inline/paginated_tabular.html'
+    per_page = 50
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('restaurant', 'product')
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_param = 'menu_page'
+        formset.request_params = request.GET
+        return formset
 
 
 @admin.register(Restaurant)
-class RestaurantAdmin(admin.ModelAdmin):
+class RestaurantAdmin(SearchBackendMixin, admin.ModelAdmin):
     search_fields = [
         'name',
         'address',
@@ -30,13 +98,22 @@ class RestaurantAdmin(admin.ModelAdmin):
         'address',
         'contact_phone',
     ]
+    readonly_fields = [
+        'latitude',
+        'longitude',
+    ]
     inlines = [
         RestaurantMenuItemInline
     ]
 
+    def save_model(self, request, obj, form, change):
+        if 'address' in form.changed_data or obj.coordinates is None:
+            update_restaurants_coordinates([obj])
+        super().save_model(request, obj, form, change)
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(SearchBackendMixin, admin.ModelAdmin):
     list_display = [
         'get_image_list_preview',
         'name',
@@ -50,8 +127,6 @@ class ProductAdmin(admin.ModelAdmin):
         'category',
     ]
     search_fields = [
-        # FIXME SQLite can not convert letter case for cyrillic words properly, so search will be buggy.
-        # Migration to PostgreSQL is necessary
         'name',
         'category__name',
     ]
@@ -91,28 +166,44 @@ class ProductAdmin(admin.ModelAdmin):
             )
         }
 
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.image_hash = ''
+        super().save_model(request, obj, form, change)
+        if obj.image and not obj.image_hash:
+            obj.image_hash = generate_thumbnails(obj.image.name)
+            obj.save(update_fields=['image_hash'])
+
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        url = obj.thumbnails['large']['jpeg'] if obj.thumbnails else obj.image.url
+        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=url)
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        src = obj.thumbnails['small']['jpeg'] if obj.thumbnails else obj.image.url
+        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=src)
     get_image_list_preview.short_description = 'превью'
 
 
 @admin.register(ProductCategory)
-class ProductAdmin(admin.ModelAdmin):
-    pass
+class ProductAdmin(SearchBackendMixin, admin.ModelAdmin):
+    search_fields = [
+        'name',
+    ]
 
 
-class ProductInline(admin.TabularInline):
+class ProductInline(SelectRelatedAutocompleteMixin, admin.TabularInline):
     model = OrderQuantity
     fields = ['product', 'cost', 'quantity',]
+    autocomplete_fields = ['product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'order')
 
 
 @admin.register(Order)
@@ -123,6 +214,31 @@ class OrderAdmin(admin.ModelAdmin):
         'last_name',
         'address',
         'phonenumber',
+        'status_order',
+        'registered_at',
+        'get_total_cost',
+        'get_items_count',
+        'restaurant',
+    ]
+    list_filter = [
+        'status_order',
+        'payment_method',
+        'restaurant',
+    ]
+    list_select_related = [
+        'restaurant',
+    ]
+    autocomplete_fields = [
+        'restaurant',
+    ]
+    date_hierarchy = 'registered_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        'confirm_orders',
+        'start_cooking_orders',
+        'start_delivery_orders',
+        'complete_orders',
     ]
 
     inlines = [
@@ -131,6 +247,44 @@ class OrderAdmin(admin.ModelAdmin):
 
     exclude = ('products',)
 
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .with_total_cost()
+            .annotate(items_count=Count('in_order_quantity'))
+        )
+
+    def get_total_cost(self, obj):
+        return obj.total_cost
+    get_total_cost.short_description = 'сумма'
+    get_total_cost.admin_order_field = 'total_cost'
+
+    def get_items_count(self, obj):
+        return obj.items_count
+    get_items_count.short_description = 'позиций'
+    get_items_count.admin_order_field = 'items_count'
+
+    def advance_orders_status(self, request, queryset, status):
+        # Заказы в других статусах остаются как есть
+        advanced = queryset.order_by().advance_status(status)
+        self.message_user(request, f'Переведено заказов: {advanced}')
+
+    def confirm_orders(self, request, queryset):
+        self.advance_orders_status(request, queryset, Order.NEW)
+    confirm_orders.short_description = 'Подтвердить'
+
+    def start_cooking_orders(self, request, queryset):
+        self.advance_orders_status(request, queryset, Order.CONFIRMED)
+    start_cooking_orders.short_description = 'Передать на кухню'
+
+    def start_delivery_orders(self, request, queryset):
+        self.advance_orders_status(request, queryset, Order.COOKING)
+    start_delivery_orders.short_description = 'Передать в доставку'
+
+    def complete_orders(self, request, queryset):
+        self.advance_orders_status(request, queryset, Order.DELIVERING)
+    complete_orders.short_description = 'Отметить выполненными'
+
     def response_change(self, request, obj):
         res = super().response_change(request, obj)
         if "next" in request.GET:
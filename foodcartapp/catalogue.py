@@ -0,0 +1,104 @@
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogueVersion, Product, RestaurantMenuItem
+
+
+# Версия хранится в базе, а не в кэше: кэш по умолчанию свой у каждого
+# процесса, и изменения из других воркеров и команд были бы не видны
+CATALOGUE_VERSION_ID = 1
+
+
+def get_catalogue_state():
+    catalogue_version, _ = CatalogueVersion.objects.get_or_create(pk=CATALOGUE_VERSION_ID)
+    return catalogue_version
+
+
+def get_catalogue_version():
+    return get_catalogue_state().version
+
+
+def bump_catalogue_version():
+    bumped = (
+        CatalogueVersion.objects
+        .filter(pk=CATALOGUE_VERSION_ID)
+        .update(version=F('version') + 1, modified_at=timezone.now())
+    )
+    if not bumped:
+        get_catalogue_state()
+
+
+def get_catalogue_modified_at():
+    return get_catalogue_state().modified_at
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'thumbnails': product.thumbnails,
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def serialize_products(products):
+    return json.dumps(
+        [serialize_product(product) for product in products],
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def get_serialized_catalogue():
+    cache_key = f'catalogue:{get_catalogue_version()}:products'
+    serialized_catalogue = cache.get(cache_key)
+    if serialized_catalogue is None:
+        products = Product.objects.select_related('category').available().order_by('id')
+        serialized_catalogue = serialize_products(products)
+        cache.set(cache_key, serialized_catalogue)
+    return serialized_catalogue
+
+
+def get_availability_matrix(restaurant_ids):
+    # Бит i маски товара выставлен, если он в продаже в ресторане restaurant_ids[i]
+    restaurant_ids = list(restaurant_ids)
+    cache_key = f'catalogue:{get_catalogue_version()}:availability'
+    cached_matrix = cache.get(cache_key)
+    if cached_matrix and cached_matrix['restaurant_ids'] == restaurant_ids:
+        return cached_matrix['availability']
+
+    restaurant_bits = {
+        restaurant_id: 1 << index
+        for index, restaurant_id in enumerate(restaurant_ids)
+    }
+    availability = {}
+    available_items = (
+        RestaurantMenuItem.objects
+        .filter(availability=True)
+        .values_list('product', 'restaurant')
+    )
+    for product_id, restaurant_id in available_items:
+        availability[product_id] = (
+            availability.get(product_id, 0) | restaurant_bits.get(restaurant_id, 0)
+        )
+    cache.set(cache_key, {
+        'restaurant_ids': restaurant_ids,
+        'availability': availability,
+    })
+    return availability
@@ -0,0 +1,30 @@
+from math import asin, cos, radians, sin, sqrt
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _prepare(coordinates):
+    return {
+        key: (radians(latitude), radians(longitude), cos(radians(latitude)))
+        for key, (latitude, longitude) in coordinates.items()
+    }
+
+
+def calculate_distances(orders_coordinates, restaurants_coordinates):
+    # {id заказа: [(id ресторана, км), ...]}, ближайшие рестораны первыми
+    restaurants = sorted(_prepare(restaurants_coordinates).items())
+    distances = {}
+    for order_key, (order_lat, order_lon, order_cos) in _prepare(orders_coordinates).items():
+        order_distances = []
+        for restaurant_key, (restaurant_lat, restaurant_lon, restaurant_cos) in restaurants:
+            haversine = (
+                sin((restaurant_lat - order_lat) / 2) ** 2
+                + order_cos * restaurant_cos * sin((restaurant_lon - order_lon) / 2) ** 2
+            )
+            order_distances.append(
+                (restaurant_key, 2 * EARTH_RADIUS_KM * asin(sqrt(min(1, haversine))))
+            )
+        order_distances.sort(key=lambda item: item[1])
+        distances[order_key] = order_distances
+    return distances
@@ -0,0 +1,37 @@
+from collections import defaultdict
+
+from .models import RestaurantMenuItem
+
+
+def get_product_restaurants(product_ids):
+    product_restaurants = defaultdict(set)
+    available_items = (
+        RestaurantMenuItem.objects
+        .filter(availability=True, product__in=product_ids)
+        .values_list('product', 'restaurant')
+    )
+    for product_id, restaurant_id in available_items:
+        product_restaurants[product_id].add(restaurant_id)
+    return product_restaurants
+
+
+def find_capable_restaurants(orders_products, product_restaurants=None):
+    # {id заказа: {id товаров}} -> {id заказа: {id ресторанов, где есть все товары}}
+    if product_restaurants is None:
+        product_restaurants = get_product_restaurants(
+            set().union(*orders_products.values())
+        )
+
+    capable_restaurants = {}
+    for order_id, products in orders_products.items():
+        restaurants_sets = sorted(
+            (product_restaurants.get(product_id, set()) for product_id in products),
+            key=len,
+        )
+        if not restaurants_sets:
+            capable_restaurants[order_id] = set()
+            continue
+        capable_restaurants[order_id] = set(restaurants_sets[0]).intersection(
+            *restaurants_sets[1:]
+        )
+    return capable_restaurants
@@ -0,0 +1,104 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Order, OrderQuantity
+
+
+ORDER_FIELDS = [
+    'id',
+    'status_order',
+    'payment_method',
+    'registered_at',
+    'first_name',
+    'last_name',
+    'phonenumber',
+    'address',
+    'comment',
+    'restaurant_id',
+]
+ITEM_FIELDS = [
+    'product_id',
+    'product__name',
+    'quantity',
+    'cost',
+]
+CSV_HEADER = ORDER_FIELDS + ['total_cost'] + ITEM_FIELDS
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_orders(since=None, until=None, status=None):
+    # Сравнение с моментами времени, а не через __date, не мешает индексу по registered_at
+    orders = Order.objects.all()
+    if since:
+        orders = orders.filter(registered_at__gte=start_of_day(since))
+    if until:
+        orders = orders.filter(registered_at__lt=start_of_day(until + timedelta(days=1)))
+    if status:
+        orders = orders.filter(status_order=status)
+    return orders
+
+
+def iter_orders_with_items(orders, chunk_size=2000):
+    # Заказы и позиции читаются двумя курсорами, отсортированными по id заказа, и сливаются на лету
+    items = (
+        OrderQuantity.objects
+        .filter(order__in=orders)
+        .order_by('order_id', 'id')
+        .values('order_id', *ITEM_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    items_groups = groupby(items, key=itemgetter('order_id'))
+    next_group = next(items_groups, None)
+
+    orders = orders.order_by('id').values(*ORDER_FIELDS).iterator(chunk_size=chunk_size)
+    for order in orders:
+        order_items = []
+        while next_group and next_group[0] < order['id']:
+            next_group = next(items_groups, None)
+        if next_group and next_group[0] == order['id']:
+            order_items = list(next_group[1])
+            next_group = next(items_groups, None)
+
+        order['phonenumber'] = str(order['phonenumber'])
+        order['total_cost'] = sum(item['cost'] for item in order_items)
+        order['items'] = [
+            {field: item[field] for field in ITEM_FIELDS}
+            for item in order_items
+        ]
+        yield order
+
+
+def iter_ndjson(orders):
+    for order in orders:
+        yield json.dumps(order, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(orders):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in orders:
+        order_row = [order[field] for field in ORDER_FIELDS + ['total_cost']]
+        if not order['items']:
+            yield writer.writerow(order_row)
+        for item in order['items']:
+            yield writer.writerow(order_row + [item[field] for field in ITEM_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
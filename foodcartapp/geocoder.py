@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils.module_loading import import_string
+from geopy.exc import GeopyError
+from geopy.location import Location
+from geopy.point import Point
+
+from .models import CoordinateAddress
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalGeocoder:
+    # Координаты из хэша адреса — для разработки без сети
+    center = (55.75, 37.62)
+    spread = 0.3
+
+    def __init__(self):
+        self.requests_count = 0
+
+    def geocode(self, query):
+        self.requests_count += 1
+        digest = hashlib.md5(query.encode('utf-8')).digest()
+        lat_shift = int.from_bytes(digest[:4], 'big') / 2 ** 32 - 0.5
+        lon_shift = int.from_bytes(digest[4:8], 'big') / 2 ** 32 - 0.5
+        point = Point(
+            self.center[0] + lat_shift * self.spread,
+            self.center[1] + lon_shift * self.spread,
+        )
+        return Location(query, point, {})
+
+
+def get_geocoder():
+    geocoder_class = import_string(settings.GEOCODER_BACKEND)
+    return geocoder_class()
+
+
+def geocode_address(address, geocoder=None):
+    geocoder = geocoder or get_geocoder()
+    try:
+        location = geocoder.geocode(address)
+    except GeopyError:
+        logger.exception('Не удалось получить координаты адреса %s', address)
+        return None
+    if not location:
+        return None
+    return location.latitude, location.longitude
+
+
+def fetch_coordinates(addresses, geocoder=None):
+    # Ненайденные адреса в результат не попадают
+    addresses = {address for address in addresses if address}
+    coordinates = {
+        address: (float(latitude), float(longitude))
+        for address, latitude, longitude in (
+            CoordinateAddress.objects
+            .filter(address__in=addresses)
+            .values_list('address', 'latitude', 'longitude')
+        )
+    }
+
+    missing_addresses = addresses - coordinates.keys()
+    if not missing_addresses:
+        return coordinates
+
+    geocoder = geocoder or get_geocoder()
+    new_coordinates = []
+    for address in missing_addresses:
+        location = geocode_address(address, geocoder)
+        if not location:
+            continue
+        coordinates[address] = location
+        new_coordinates.append(CoordinateAddress(
+            address=address,
+            latitude=location[0],
+            longitude=location[1],
+        ))
+    CoordinateAddress.objects.bulk_create(new_coordinates, ignore_conflicts=True)
+    return coordinates
+
+
+def update_restaurants_coordinates(restaurants, geocoder=None):
+    # Сохранять рестораны должен вызывающий код
+    coordinates = fetch_coordinates(
+        [restaurant.address for restaurant in restaurants],
+        geocoder,
+    )
+    for restaurant in restaurants:
+        restaurant.latitude, restaurant.longitude = coordinates.get(
+            restaurant.address,
+            (None, None),
+        )
+    return restaurants
+
+
+class GeocodingQueue:
+    def __init__(self, workers=2, max_attempts=3, backoff=1):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._executor = None
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._failures = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'depth': self._depth, 'failures': self._failures}
+
+    def submit(self, address):
+        with self._lock:
+            if not self._executor:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='geocoder',
+                )
+            self._depth += 1
+        return self._executor.submit(self._process, address)
+
+    def _process(self, address):
+        is_geocoded = False
+        try:
+            is_geocoded = self._geocode_with_retries(address)
+        except DatabaseError:
+            logger.exception('Не удалось сохранить координаты адреса %s', address)
+        finally:
+            connection.close()
+            with self._lock:
+                self._depth -= 1
+                if not is_geocoded:
+                    self._failures += 1
+
+    def _geocode_with_retries(self, address):
+        if CoordinateAddress.objects.filter(address=address).exists():
+            return True
+
+        geocoder = get_geocoder()
+        for attempt in range(self.max_attempts):
+            try:
+                location = geocoder.geocode(address)
+            except GeopyError:
+                logger.warning(
+                    'Попытка %s: не удалось получить координаты адреса %s',
+                    attempt + 1, address,
+                )
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(self.backoff * 2 ** attempt)
+                continue
+            if not location:
+                logger.warning('Адрес %s не найден', address)
+                return False
+            CoordinateAddress.objects.get_or_create(
+                address=address,
+                defaults={
+                    'latitude': location.latitude,
+                    'longitude': location.longitude,
+                },
+            )
+            return True
+        return False
+
+
+geocoding_queue = GeocodingQueue(workers=settings.GEOCODER_WORKERS)
@@ -0,0 +1,81 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IN_PROGRESS = 'in-progress'
+
+
+def _replay(stored_response):
+    response = HttpResponse(
+        stored_response['content'],
+        status=stored_response['status'],
+        content_type=stored_response['content_type'],
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _get_stored_response(cache_key, request_fingerprint):
+    stored_response = cache.get(cache_key)
+    if stored_response is None:
+        return None
+    if stored_response == IN_PROGRESS:
+        return JsonResponse(
+            {'detail': 'Запрос с таким Idempotency-Key ещё обрабатывается'},
+            status=409,
+            json_dumps_params={'ensure_ascii': False},
+        )
+    if stored_response['fingerprint'] != request_fingerprint:
+        return JsonResponse(
+            {'detail': 'Idempotency-Key уже использован для другого запроса'},
+            status=422,
+            json_dumps_params={'ensure_ascii': False},
+        )
+    return _replay(stored_response)
+
+
+def idempotent(view):
+    # cache.add атомарен, поэтому из одновременных запросов с одним ключом выполнится только один
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not idempotency_key:
+            return view(request, *args, **kwargs)
+
+        cache_key = 'idempotency:{}:{}'.format(
+            request.path,
+            hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest(),
+        )
+        request_fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        if not cache.add(cache_key, IN_PROGRESS, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            stored_response = _get_stored_response(cache_key, request_fingerprint)
+            if stored_response:
+                return stored_response
+            # Ключ истёк между add и get — выполняем запрос без защиты от повтора
+            return view(request, *args, **kwargs)
+
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+            return response
+        cache.set(cache_key, {
+            'fingerprint': request_fingerprint,
+            'status': response.status_code,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+        }, timeout=settings.IDEMPOTENCY_KEY_TTL)
+        return response
+    return wrapper
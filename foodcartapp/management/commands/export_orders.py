@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from foodcartapp.export import EXPORT_FORMATS, filter_orders, iter_orders_with_items
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заказы с позициями в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--since', type=parse_date, help='с даты, ГГГГ-ММ-ДД')
+        parser.add_argument('--until', type=parse_date, help='по дату включительно, ГГГГ-ММ-ДД')
+        parser.add_argument('--status', choices=[status for status, _ in Order.STATUSES])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--output', help='файл для выгрузки, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        orders = filter_orders(options['since'], options['until'], options['status'])
+        render, _ = EXPORT_FORMATS[options['format']]
+        rows = render(iter_orders_with_items(orders, options['chunk_size']))
+
+        if not options['output']:
+            sys.stdout.writelines(rows)
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(rows)
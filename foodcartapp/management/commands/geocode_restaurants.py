@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.geocoder import update_restaurants_coordinates
+from foodcartapp.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Заполняет координаты ресторанов по их адресам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='пересчитать координаты у всех ресторанов, а не только у пустых',
+        )
+
+    def handle(self, *args, **options):
+        restaurants = Restaurant.objects.exclude(address='')
+        if not options['all']:
+            restaurants = restaurants.filter(latitude__isnull=True)
+        restaurants = update_restaurants_coordinates(list(restaurants))
+        Restaurant.objects.bulk_update(restaurants, ['latitude', 'longitude'])
+
+        located = [restaurant for restaurant in restaurants if restaurant.coordinates]
+        self.stdout.write(
+            f'Обновлено ресторанов: {len(located)} из {len(restaurants)}'
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from foodcartapp.catalogue import bump_catalogue_version
+from foodcartapp.menu import update_available_restaurants_count
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает, в скольких ресторанах продаётся каждый товар'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='только сверить сохранённые значения с меню ресторанов',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            updated = update_available_restaurants_count()
+            bump_catalogue_version()
+            self.stdout.write(f'Пересчитано товаров: {updated}')
+            return
+
+        inconsistent_products = (
+            Product.objects
+            .with_actual_available_restaurants_count()
+            .exclude(available_restaurants_count=F('actual_available_restaurants_count'))
+        )
+        for product in inconsistent_products:
+            self.stdout.write(
+                f'{product.id} {product.name}: сохранено {product.available_restaurants_count}, '
+                f'на самом деле {product.actual_available_restaurants_count}'
+            )
+        if inconsistent_products:
+            raise CommandError(
+                'Данные о наличии товаров расходятся с меню, '
+                'запустите команду без --check'
+            )
+        self.stdout.write('Расхождений нет')
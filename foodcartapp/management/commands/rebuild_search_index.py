@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from foodcartapp.search import create_search_indexes, drop_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт поисковые индексы товаров, категорий и ресторанов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='база данных, по умолчанию default',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        drop_search_indexes(connection)
+        create_search_indexes(connection)
+        self.stdout.write('Поисковые индексы пересозданы')
@@ -0,0 +1,58 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from foodcartapp.catalogue import bump_catalogue_version
+from foodcartapp.models import Product
+from foodcartapp.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='обработать все товары, а не только те, у которых копий ещё нет',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='число процессов, по умолчанию по числу ядер',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').only('id', 'image', 'image_hash')
+        if not options['all']:
+            products = products.filter(image_hash='')
+        products = list(products)
+        if not products:
+            self.stdout.write('Нет картинок для обработки')
+            return
+
+        # Дочерние процессы не должны унаследовать открытые соединения с базой
+        connections.close_all()
+        processed_products = []
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                executor.submit(generate_thumbnails, product.image.name): product
+                for product in products
+            }
+            for future in as_completed(futures):
+                product = futures[future]
+                try:
+                    product.image_hash = future.result()
+                except Exception as error:
+                    self.stderr.write(f'{product.id} {product.image.name}: {error}')
+                    continue
+                processed_products.append(product)
+
+        Product.objects.bulk_update(processed_products, ['image_hash'], batch_size=500)
+        bump_catalogue_version()
+        self.stdout.write(f'Обработано картинок: {len(processed_products)}')
+        failed_count = len(products) - len(processed_products)
+        if failed_count:
+            raise CommandError(f'Не удалось обработать картинок: {failed_count}')
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .catalogue import bump_catalogue_version
+from .models import Product, RestaurantMenuItem
+
+
+def update_available_restaurants_count(product_ids=None):
+    # Без product_ids пересчитываются все товары
+    available_count = (
+        RestaurantMenuItem.objects
+        .filter(product=OuterRef('pk'), availability=True)
+        .order_by()
+        .values('product')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    return products.update(
+        available_restaurants_count=Coalesce(Subquery(available_count), 0)
+    )
+
+
+@transaction.atomic
+def set_menu_availability(changes):
+    # bulk-операции не отправляют сигналы, поэтому кэш каталога сбрасывается здесь
+    changes = dict(changes)
+    if not changes:
+        return {'updated': 0, 'created': 0}
+
+    restaurant_ids = {restaurant_id for restaurant_id, _ in changes}
+    product_ids = {product_id for _, product_id in changes}
+    menu_items = (
+        RestaurantMenuItem.objects
+        .select_for_update()
+        .filter(restaurant__in=restaurant_ids, product__in=product_ids)
+    )
+
+    changed_items = []
+    for menu_item in menu_items:
+        availability = changes.pop((menu_item.restaurant_id, menu_item.product_id), None)
+        if availability is None or availability == menu_item.availability:
+            continue
+        menu_item.availability = availability
+        changed_items.append(menu_item)
+    RestaurantMenuItem.objects.bulk_update(changed_items, ['availability'])
+
+    new_items = [
+        RestaurantMenuItem(
+            restaurant_id=restaurant_id,
+            product_id=product_id,
+            availability=availability,
+        )
+        for (restaurant_id, product_id), availability in changes.items()
+    ]
+    RestaurantMenuItem.objects.bulk_create(new_items, ignore_conflicts=True)
+
+    if changed_items or new_items:
+        update_available_restaurants_count(
+            {menu_item.product_id for menu_item in changed_items + new_items}
+        )
+        transaction.on_commit(bump_catalogue_version)
+    return {'updated': len(changed_items), 'created': len(new_items)}
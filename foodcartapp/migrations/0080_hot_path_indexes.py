@@ -0,0 +1,25 @@
+# Generated by Django 3.2 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0079_order_status_registered_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(status_order='N'), fields=['registered_at', 'id'], name='order_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderquantity',
+            index=models.Index(fields=['order', 'product'], name='order_quantity_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantmenuitem',
+            index=models.Index(condition=models.Q(availability=True), fields=['product', 'restaurant'], name='menu_item_available_idx'),
+        ),
+    ]
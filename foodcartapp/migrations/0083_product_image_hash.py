@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0082_product_available_restaurants_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, help_text='по нему строятся имена уменьшенных копий картинки', max_length=16, verbose_name='хэш картинки'),
+        ),
+    ]
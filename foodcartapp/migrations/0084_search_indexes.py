@@ -0,0 +1,84 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+SEARCH_INDEXES = {
+    'foodcartapp_product': ['name'],
+    'foodcartapp_productcategory': ['name'],
+    'foodcartapp_restaurant': ['name', 'address'],
+}
+
+
+def create_sqlite_fts_table(cursor, table, columns):
+    fts_table = f'{table}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5('
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='trigram')"
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values}); END"
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE ON {table} BEGIN '
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END'
+    )
+    cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table, columns in SEARCH_INDEXES.items():
+                for column in columns:
+                    cursor.execute(
+                        f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+                        f'ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+                    )
+        elif connection.vendor == 'sqlite':
+            # Триграммный токенизатор есть в SQLite с 3.34, без него поиск работает через casefold
+            if connection.Database.sqlite_version_info < (3, 34, 0):
+                return
+            try:
+                for table, columns in SEARCH_INDEXES.items():
+                    create_sqlite_fts_table(cursor, table, columns)
+            except OperationalError:
+                # SQLite собран без FTS5
+                drop_search_indexes(apps, schema_editor)
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for table, columns in SEARCH_INDEXES.items():
+            if connection.vendor == 'postgresql':
+                for column in columns:
+                    cursor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+            elif connection.vendor == 'sqlite':
+                fts_table = f'{table}_fts'
+                for action in ['insert', 'delete', 'update']:
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{action}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0083_product_image_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
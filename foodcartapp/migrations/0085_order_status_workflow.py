@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0084_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cooking_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='начало приготовления'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='передан в доставку'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status_order',
+            field=models.CharField(choices=[('N', 'Необработанный'), ('C', 'Подтверждён'), ('K', 'Готовится'), ('D', 'Доставляется'), ('Y', 'Выполнен')], default='N', max_length=2, verbose_name='статус'),
+        ),
+    ]
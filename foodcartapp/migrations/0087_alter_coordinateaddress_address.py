@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0086_order_restaurant'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coordinateaddress',
+            name='address',
+            field=models.CharField(max_length=200, unique=True, verbose_name='адрес'),
+        ),
+    ]
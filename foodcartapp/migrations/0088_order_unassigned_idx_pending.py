@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0087_alter_coordinateaddress_address'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_unassigned_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('restaurant__isnull', True), ('status_order', 'N')), fields=['registered_at', 'id'], name='order_unassigned_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-18 18:49
+
+from django.db import migrations, models
+import django.utils.timezone
+import foodcartapp.models
+
+
+def create_catalogue_version(apps, schema_editor):
+    CatalogueVersion = apps.get_model('foodcartapp', 'CatalogueVersion')
+    CatalogueVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0088_order_unassigned_idx_pending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=foodcartapp.models.get_initial_catalogue_version, verbose_name='версия')),
+                ('modified_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='изменён')),
+            ],
+            options={
+                'verbose_name': 'версия каталога',
+                'verbose_name_plural': 'версии каталога',
+            },
+        ),
+        migrations.RunPython(create_catalogue_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 18:52
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0089_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coordinateaddress',
+            name='latitude',
+            field=models.DecimalField(decimal_places=6, max_digits=9, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='широта'),
+        ),
+        migrations.AlterField(
+            model_name='coordinateaddress',
+            name='longitude',
+            field=models.DecimalField(decimal_places=6, max_digits=9, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='долгота'),
+        ),
+    ]
@@ -1,17 +1,94 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import Sum, F
 
+from .thumbnails import get_thumbnail_urls
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+# Сколько заказов без ресторана перебирает claim_next за один запрос
+CLAIM_BATCH_SIZE = 20
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_status(self, status):
+        return self.filter(status_order=status)
+
+    def pending(self):
+        return self.with_status(Order.NEW)
+
+    def confirmed(self):
+        return self.with_status(Order.CONFIRMED)
+
+    def cooking(self):
+        return self.with_status(Order.COOKING)
+
+    def delivering(self):
+        return self.with_status(Order.DELIVERING)
+
+    def completed(self):
+        return self.with_status(Order.DONE)
+
+    def advance_status(self, status):
+        # Статус проверяется в самом UPDATE, поэтому из одновременных переводов сработает один
+        next_status = Order.NEXT_STATUSES.get(status)
+        if next_status is None:
+            raise ValueError(f'Заказ в статусе {status} некуда переводить')
+        return self.with_status(status).update(
+            status_order=next_status,
+            **{Order.STATUS_TIMESTAMPS[next_status]: timezone.now()},
+        )
 
-class OrderQuantityQuerySet(models.QuerySet):
-    def cost_order(self):
-        required_fields = self.prefetch_related('order', 'product')
-        required_fields = (
-            required_fields.annotate(
-                cost_order=Sum(F('quantity') * F('cost'))).all()
+    def unassigned(self):
+        return self.filter(restaurant__isnull=True)
+
+    def claim_next(self, restaurant):
+        candidates = self.pending().unassigned().order_by('registered_at', 'id')
+        connection = transaction.get_connection(self.db)
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=self.db):
+                order = (
+                    candidates
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .first()
+                )
+                if order is None:
+                    return None
+                Order.objects.filter(pk=order.pk).update(restaurant=restaurant)
+            order.restaurant = restaurant
+            return order
+
+        # Без SKIP LOCKED заказ забирается условным UPDATE, занятые кем-то заказы пропускаются
+        while True:
+            order_ids = list(candidates.values_list('id', flat=True)[:CLAIM_BATCH_SIZE])
+            if not order_ids:
+                return None
+            for order_id in order_ids:
+                claimed = (
+                    Order.objects
+                    .filter(pk=order_id, status_order=Order.NEW, restaurant__isnull=True)
+                    .update(restaurant=restaurant)
+                )
+                if claimed:
+                    return self.model.objects.get(pk=order_id)
+
+    def registered_after(self, registered_at, order_id):
+        # Курсор по паре (registered_at, id): заказы с одинаковым временем
+        # регистрации не теряются и не повторяются между страницами
+        return self.filter(
+            Q(registered_at__gt=registered_at)
+            | Q(registered_at=registered_at, id__gt=order_id)
+        ).order_by('registered_at', 'id')
+
+    def with_total_cost(self):
+        # В OrderQuantity.cost уже хранится цена позиции с учётом количества
+        return self.annotate(
+            total_cost=Coalesce(Sum('in_order_quantity__cost'), Value(Decimal(0)))
         )
-        return required_fields
 
 
 class Restaurant(models.Model):
@@ -29,6 +106,22 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    latitude = models.DecimalField(
+        'широта',
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.DecimalField(
+        'долгота',
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -37,15 +130,24 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def coordinates(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return float(self.latitude), float(self.longitude)
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
+        return self.filter(available_restaurants_count__gt=0)
+
+    def with_actual_available_restaurants_count(self):
+        return self.annotate(
+            actual_available_restaurants_count=Count(
+                'menu_items',
+                filter=Q(menu_items__availability=True),
+            )
         )
-        return self.filter(pk__in=products)
 
 
 class ProductCategory(models.Model):
@@ -84,6 +186,13 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    image_hash = models.CharField(
+        'хэш картинки',
+        max_length=16,
+        blank=True,
+        editable=False,
+        help_text='по нему строятся имена уменьшенных копий картинки',
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -94,6 +203,13 @@ class Product(models.Model):
         max_length=200,
         blank=True,
     )
+    available_restaurants_count = models.PositiveIntegerField(
+        'в продаже в ресторанах',
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text='пересчитывается автоматически при изменении меню ресторанов',
+    )
 
     objects = ProductQuerySet.as_manager()
 
@@ -104,6 +220,10 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def thumbnails(self):
+        return get_thumbnail_urls(self.image_hash)
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -130,16 +250,51 @@ class RestaurantMenuItem(models.Model):
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(
+                fields=['product', 'restaurant'],
+                name='menu_item_available_idx',
+                condition=Q(availability=True),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.restaurant.name} - {self.product.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        menu_item = super().from_db(db, field_names, values)
+        # Товар пункта меню можно сменить, и тогда пересчитывать нужно оба товара
+        menu_item.loaded_product_id = menu_item.__dict__.get('product_id')
+        return menu_item
+
 
 class Order(models.Model):
+    NEW = 'N'
+    CONFIRMED = 'C'
+    COOKING = 'K'
+    DELIVERING = 'D'
+    DONE = 'Y'
     STATUSES = (
-        ('N', 'Необработанный'),
-        ('Y', 'Обработан'),
+        (NEW, 'Необработанный'),
+        (CONFIRMED, 'Подтверждён'),
+        (COOKING, 'Готовится'),
+        (DELIVERING, 'Доставляется'),
+        (DONE, 'Выполнен'),
     )
+    NEXT_STATUSES = {
+        NEW: CONFIRMED,
+        CONFIRMED: COOKING,
+        COOKING: DELIVERING,
+        DELIVERING: DONE,
+    }
+    # Поле, в котором запоминается время перехода в статус
+    STATUS_TIMESTAMPS = {
+        CONFIRMED: 'called_at',
+        COOKING: 'cooking_started_at',
+        DELIVERING: 'delivery_started_at',
+        DONE: 'delivered_at',
+    }
     PAYMENT_METHODS = (
         ('C', 'Наличными'),
         ('E', 'Электронно'),
@@ -147,7 +302,7 @@ class Order(models.Model):
     status_order = models.CharField(verbose_name='статус',
                                     max_length=2,
                                     choices=STATUSES,
-                                    default='N')
+                                    default=NEW)
     payment_method = models.CharField(verbose_name='способ оплаты',
                                       max_length=2,
                                       choices=PAYMENT_METHODS,)
@@ -162,8 +317,7 @@ class Order(models.Model):
     last_name = models.CharField(verbose_name='фамилия',
                                  max_length=100,)
     address = models.CharField(verbose_name='адрес',
-                               max_length=200,
-                               unique=True)
+                               max_length=200)
     phonenumber = PhoneNumberField(verbose_name='телефон',
                                    region="RU")
 
@@ -172,17 +326,77 @@ class Order(models.Model):
     called_at = models.DateTimeField(verbose_name='дата звонка',
                                      blank=True,
                                      null=True)
+    cooking_started_at = models.DateTimeField(verbose_name='начало приготовления',
+                                              blank=True,
+                                              null=True)
+    delivery_started_at = models.DateTimeField(verbose_name='передан в доставку',
+                                               blank=True,
+                                               null=True)
     delivered_at = models.DateTimeField(verbose_name='дата доставки',
                                         blank=True,
                                         null=True)
+    restaurant = models.ForeignKey(Restaurant,
+                                   verbose_name='готовит ресторан',
+                                   related_name='orders',
+                                   on_delete=models.SET_NULL,
+                                   blank=True,
+                                   null=True)
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(
+                fields=['status_order', 'registered_at'],
+                name='order_status_registered_idx',
+            ),
+            models.Index(
+                fields=['registered_at', 'id'],
+                name='order_pending_idx',
+                condition=Q(status_order='N'),
+            ),
+            models.Index(
+                fields=['registered_at', 'id'],
+                name='order_unassigned_idx',
+                condition=Q(status_order='N', restaurant__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.first_name} {self.last_name}, {self.address}'
 
+    def advance_status(self, status):
+        if not Order.objects.filter(pk=self.pk).advance_status(status):
+            return False
+        next_status = Order.NEXT_STATUSES[status]
+        self.refresh_from_db(fields=['status_order', Order.STATUS_TIMESTAMPS[next_status]])
+        return True
+
+    def assign_restaurant(self, restaurant):
+        assigned = (
+            Order.objects
+            .filter(pk=self.pk, restaurant__isnull=True)
+            .update(restaurant=restaurant)
+        )
+        if not assigned:
+            return False
+        self.restaurant = restaurant
+        return True
+
+    def confirm(self):
+        return self.advance_status(Order.NEW)
+
+    def start_cooking(self):
+        return self.advance_status(Order.CONFIRMED)
+
+    def start_delivery(self):
+        return self.advance_status(Order.COOKING)
+
+    def complete(self):
+        return self.advance_status(Order.DELIVERING)
+
 
 class OrderQuantity(models.Model):
     product = models.ForeignKey(Product,
@@ -199,11 +413,16 @@ class OrderQuantity(models.Model):
                                max_digits=8,
                                decimal_places=2,
                                validators=[MinValueValidator(0)])
-    objects = OrderQuantityQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Элемент заказа'
         verbose_name_plural = 'Элементы заказа'
+        indexes = [
+            models.Index(
+                fields=['order', 'product'],
+                name='order_quantity_product_idx',
+            ),
+        ]
 
     def __str__(self):
         return '{}_{}'.format(self.product.__str__(), self.order.__str__())
@@ -211,19 +430,39 @@ class OrderQuantity(models.Model):
 
 class CoordinateAddress(models.Model):
     address = models.CharField(verbose_name='адрес',
-                               max_length=150,
+                               max_length=200,
                                unique=True)
     latitude = models.DecimalField('широта',
-                                   max_digits=8,
-                                   decimal_places=2,
+                                   max_digits=9,
+                                   decimal_places=6,
                                    validators=[
                                       MinValueValidator(-90),
                                       MaxValueValidator(90)
                                    ])
     longitude = models.DecimalField('долгота',
-                                    max_digits=8,
-                                    decimal_places=2,
+                                    max_digits=9,
+                                    decimal_places=6,
                                     validators=[
                                       MinValueValidator(-180),
                                       MaxValueValidator(180)
                                    ])
+
+
+def get_initial_catalogue_version():
+    # Версия начинается с текущего времени, а не с единицы, чтобы после
+    # пересоздания базы она не совпала с ключами, которые остались в кэше
+    return int(timezone.now().timestamp() * 1000)
+
+
+class CatalogueVersion(models.Model):
+    version = models.BigIntegerField('версия',
+                                     default=get_initial_catalogue_version)
+    modified_at = models.DateTimeField('изменён',
+                                       default=timezone.now)
+
+    class Meta:
+        verbose_name = 'версия каталога'
+        verbose_name_plural = 'версии каталога'
+
+    def __str__(self):
+        return f'{self.version}'
@@ -0,0 +1,57 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+
+
+ESTIMATE_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = self.get_estimated_count()
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+
+    def get_estimated_count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct:
+            return None
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [query.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if not row or row[0] < 0:
+            return None
+        return int(row[0])
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    per_page = 50
+    page_param = 'page'
+    request_params = None
+
+    def get_queryset(self):
+        if not hasattr(self, 'page'):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            page_number = (self.request_params or {}).get(self.page_param)
+            self.page = paginator.get_page(page_number)
+        return self.page.object_list
+
+    def get_page_links(self):
+        self.get_queryset()
+        if not self.page.has_other_pages():
+            return []
+        params = self.request_params.copy()
+        page_links = []
+        for number in self.page.paginator.page_range:
+            params[self.page_param] = number
+            page_links.append((number, f'?{params.urlencode()}'))
+        return page_links
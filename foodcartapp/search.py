@@ -0,0 +1,158 @@
+from django.db import connections
+from django.db.utils import OperationalError
+from django.db.models import CharField, Func, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.text import smart_split, unescape_string_literal
+
+
+# Поля, по которым строятся поисковые индексы: {таблица: [колонки]}
+SEARCH_INDEXES = {
+    'foodcartapp_product': ['name'],
+    'foodcartapp_productcategory': ['name'],
+    'foodcartapp_restaurant': ['name', 'address'],
+}
+TRIGRAM_MIN_LENGTH = 3
+# С этой версии в SQLite есть триграммный токенизатор FTS5
+TRIGRAM_SQLITE_VERSION = (3, 34, 0)
+
+_fts_tables = {}
+
+
+class Casefold(Func):
+    function = 'casefold'
+    output_field = CharField()
+
+
+def casefold(value):
+    if value is None:
+        return None
+    return value.casefold()
+
+
+def register_sqlite_functions(connection):
+    # В SQLite LOWER и LIKE не меняют регистр кириллицы
+    connection.connection.create_function('casefold', 1, casefold, deterministic=True)
+
+
+def get_fts_table(table):
+    return f'{table}_fts'
+
+
+def create_sqlite_fts_table(cursor, table, columns):
+    fts_table = get_fts_table(table)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5('
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='trigram')"
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values}); END"
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE ON {table} BEGIN '
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END'
+    )
+    cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def create_search_indexes(connection):
+    # После каждого migrate индексы создаются заново сигналом post_migrate
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table, columns in SEARCH_INDEXES.items():
+                for column in columns:
+                    cursor.execute(
+                        f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+                        f'ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+                    )
+        elif connection.vendor == 'sqlite':
+            if connection.Database.sqlite_version_info < TRIGRAM_SQLITE_VERSION:
+                return
+            try:
+                for table, columns in SEARCH_INDEXES.items():
+                    create_sqlite_fts_table(cursor, table, columns)
+            except OperationalError:
+                # SQLite собран без FTS5, поиск будет работать через casefold
+                drop_search_indexes(connection)
+    _fts_tables.pop(connection.alias, None)
+
+
+def drop_search_indexes(connection):
+    with connection.cursor() as cursor:
+        for table, columns in SEARCH_INDEXES.items():
+            if connection.vendor == 'postgresql':
+                for column in columns:
+                    cursor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+            elif connection.vendor == 'sqlite':
+                fts_table = get_fts_table(table)
+                for action in ['insert', 'delete', 'update']:
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{action}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+    _fts_tables.pop(connection.alias, None)
+
+
+def has_fts_table(connection, table):
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = set(connection.introspection.table_names())
+    return get_fts_table(table) in _fts_tables[connection.alias]
+
+
+def resolve_search_field(model, field_path):
+    *relations, field_name = field_path.split(LOOKUP_SEP)
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model, model._meta.get_field(field_name).column
+
+
+def build_term_filter(queryset, field_path, term):
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        # На PostgreSQL icontains использует триграммные индексы
+        return queryset, Q(**{f'{field_path}__icontains': term})
+
+    model, column = resolve_search_field(queryset.model, field_path)
+    table = model._meta.db_table
+    if (
+        len(term) >= TRIGRAM_MIN_LENGTH
+        and column in SEARCH_INDEXES.get(table, [])
+        and has_fts_table(connection, table)
+    ):
+        fts_table = get_fts_table(table)
+        matched_ids = RawSQL(
+            f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s',
+            ['{} : "{}"'.format(column, term.replace('"', '""'))],
+        )
+        *relations, _ = field_path.split(LOOKUP_SEP)
+        lookup = LOOKUP_SEP.join(relations + ['in']) if relations else 'pk__in'
+        return queryset, Q(**{lookup: matched_ids})
+
+    alias = '{}_casefolded'.format(field_path.replace(LOOKUP_SEP, '_'))
+    queryset = queryset.alias(**{alias: Casefold(field_path)})
+    return queryset, Q(**{f'{alias}__contains': term.casefold()})
+
+
+def search(queryset, search_fields, search_string):
+    # Каждое слово должно найтись хотя бы в одном из полей, как в поиске админки
+    for bit in smart_split(search_string):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if not bit:
+            continue
+        term_filter = Q()
+        for field_path in search_fields:
+            queryset, field_filter = build_term_filter(queryset, field_path, bit)
+            term_filter |= field_filter
+        queryset = queryset.filter(term_filter)
+    return queryset
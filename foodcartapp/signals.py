@@ -0,0 +1,42 @@
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .catalogue import bump_catalogue_version
+from .menu import update_available_restaurants_count
+from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .search import SEARCH_INDEXES, create_search_indexes, register_sqlite_functions
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_catalogue(sender, **kwargs):
+    # До коммита параллельный запрос закэшировал бы под новой версией старые данные
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def update_product_availability(sender, instance, **kwargs):
+    product_ids = {instance.product_id, getattr(instance, 'loaded_product_id', None)}
+    update_available_restaurants_count(product_ids - {None})
+    instance.loaded_product_id = instance.product_id
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_sqlite_functions(connection)
+
+
+@receiver(post_migrate)
+def recreate_search_indexes(sender, using, **kwargs):
+    # SQLite пересоздаёт таблицу при изменении поля и теряет триггеры поискового индекса
+    if sender.name != 'foodcartapp':
+        return
+    connection = connections[using]
+    if not set(SEARCH_INDEXES) <= set(connection.introspection.table_names()):
+        return
+    create_search_indexes(connection)
@@ -0,0 +1,767 @@
+import copy
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import utc
+
+from .catalogue import get_catalogue_version
+from .eligibility import find_capable_restaurants, get_product_restaurants
+from .export import filter_orders
+from .geocoder import LocalGeocoder, fetch_coordinates
+from .idempotency import idempotent
+from .models import (
+    Order,
+    OrderQuantity,
+    OrderQuerySet,
+    Product,
+    Restaurant,
+    RestaurantMenuItem,
+)
+from .search import search
+
+
+def create_order(**kwargs):
+    return Order.objects.create(
+        first_name='Иван',
+        last_name='Петров',
+        phonenumber='+79001234567',
+        address='Москва, Красная площадь, 1',
+        payment_method='C',
+        **kwargs,
+    )
+
+
+def create_product(name='Бургер', price=100):
+    return Product.objects.create(name=name, price=price, image='burger.png')
+
+
+class FetchCoordinatesTest(TestCase):
+    def test_cached_coordinates_keep_precision(self):
+        address = 'Москва, Тверская, 1'
+        geocoder = LocalGeocoder()
+        latitude, longitude = fetch_coordinates([address], geocoder)[address]
+
+        cached_latitude, cached_longitude = fetch_coordinates([address], geocoder)[address]
+        self.assertEqual(geocoder.requests_count, 1)
+        self.assertAlmostEqual(cached_latitude, latitude, places=6)
+        self.assertAlmostEqual(cached_longitude, longitude, places=6)
+
+
+class FindCapableRestaurantsTest(TestCase):
+    def test_only_restaurants_with_whole_order(self):
+        burger, fries, cola = [create_product(name) for name in ['Бургер', 'Картошка', 'Кола']]
+        full_menu = Restaurant.objects.create(name='Полное меню', address='Москва')
+        burgers_only = Restaurant.objects.create(name='Только бургеры', address='Москва')
+        RestaurantMenuItem.objects.bulk_create([
+            RestaurantMenuItem(restaurant=full_menu, product=burger),
+            RestaurantMenuItem(restaurant=full_menu, product=fries),
+            RestaurantMenuItem(restaurant=full_menu, product=cola),
+            RestaurantMenuItem(restaurant=burgers_only, product=burger),
+            RestaurantMenuItem(restaurant=burgers_only, product=fries, availability=False),
+        ])
+
+        with self.assertNumQueries(1):
+            capable_restaurants = find_capable_restaurants({
+                1: {burger.id, fries.id},
+                2: {burger.id},
+            })
+        self.assertEqual(capable_restaurants, {
+            1: {full_menu.id},
+            2: {full_menu.id, burgers_only.id},
+        })
+        self.assertEqual(set(get_product_restaurants({burger.id})), {burger.id})
+
+
+class OrderQuerySetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.burger = create_product('Бургер', 150)
+        cls.fries = create_product('Картошка', 70)
+
+    def add_line(self, order, product, quantity):
+        OrderQuantity.objects.create(
+            order=order,
+            product=product,
+            quantity=quantity,
+            cost=product.price * quantity,
+        )
+
+    def test_total_cost_of_order_without_lines_is_zero(self):
+        order = create_order()
+        self.assertEqual(
+            Order.objects.with_total_cost().get(pk=order.pk).total_cost,
+            Decimal(0),
+        )
+
+    def test_total_cost_sums_all_lines(self):
+        order = create_order()
+        self.add_line(order, self.burger, 2)
+        self.add_line(order, self.fries, 3)
+        self.assertEqual(
+            Order.objects.with_total_cost().get(pk=order.pk).total_cost,
+            Decimal('510.00'),
+        )
+
+    def test_total_cost_with_items_count(self):
+        empty_order = create_order()
+        order = create_order()
+        self.add_line(order, self.burger, 1)
+        self.add_line(order, self.fries, 4)
+
+        orders = (
+            Order.objects
+            .with_total_cost()
+            .annotate(items_count=Count('in_order_quantity'))
+            .in_bulk([empty_order.pk, order.pk])
+        )
+        self.assertEqual(orders[empty_order.pk].total_cost, Decimal(0))
+        self.assertEqual(orders[empty_order.pk].items_count, 0)
+        self.assertEqual(orders[order.pk].total_cost, Decimal('430.00'))
+        self.assertEqual(orders[order.pk].items_count, 2)
+
+    def test_pending_totals_on_many_orders(self):
+        orders = [
+            create_order(status_order=Order.NEW if number % 3 else Order.DONE)
+            for number in range(300)
+        ]
+        OrderQuantity.objects.bulk_create(
+            OrderQuantity(order=order, product=self.burger, quantity=1, cost=self.burger.price)
+            for number, order in enumerate(orders)
+            for _ in range(number % 4)
+        )
+
+        with self.assertNumQueries(1):
+            totals = dict(
+                Order.objects.pending().with_total_cost().values_list('id', 'total_cost')
+            )
+        expected_totals = {
+            order.pk: self.burger.price * (number % 4)
+            for number, order in enumerate(orders)
+            if order.status_order == Order.NEW
+        }
+        self.assertEqual(totals, expected_totals)
+
+
+class CatalogueInvalidationTest(TestCase):
+    def test_catalogue_version_is_bumped_after_commit(self):
+        product = create_product()
+        version = get_catalogue_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Двойной бургер'
+            product.save()
+            self.assertEqual(get_catalogue_version(), version)
+        self.assertGreater(get_catalogue_version(), version)
+
+    def test_catalogue_version_is_not_kept_in_cache(self):
+        # Кэш по умолчанию свой у каждого процесса, версия должна пережить его очистку
+        version = get_catalogue_version()
+        call_command('rebuild_available_products', stdout=StringIO())
+        cache.clear()
+        self.assertGreater(get_catalogue_version(), version)
+
+
+class ProductAvailabilityTest(TestCase):
+    def test_changing_menu_item_product_recounts_both_products(self):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        old_product = create_product('Бургер')
+        new_product = create_product('Картошка')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=old_product)
+
+        menu_item = RestaurantMenuItem.objects.get()
+        menu_item.product = new_product
+        menu_item.save()
+
+        old_product.refresh_from_db()
+        new_product.refresh_from_db()
+        self.assertEqual(old_product.available_restaurants_count, 0)
+        self.assertEqual(new_product.available_restaurants_count, 1)
+        self.assertQuerysetEqual(Product.objects.available(), [new_product])
+
+        menu_item.delete()
+        new_product.refresh_from_db()
+        self.assertEqual(new_product.available_restaurants_count, 0)
+
+
+class ProductListApiTest(TestCase):
+    def setUp(self):
+        # Откат транзакции теста возвращает прежнюю версию каталога, а кэш остаётся
+        cache.clear()
+
+    def test_not_modified_until_catalogue_changes(self):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        product = create_product()
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+
+        etag = self.client.get('/api/products/')['ETag']
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        product.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Двойной бургер'
+            product.save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Двойной бургер')
+
+
+class MenuAvailabilityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', is_staff=True)
+        cls.first_restaurant = Restaurant.objects.create(name='Ресторан 1', address='Москва')
+        cls.second_restaurant = Restaurant.objects.create(name='Ресторан 2', address='Москва')
+        cls.burger = create_product('Бургер')
+        cls.fries = create_product('Картошка')
+        RestaurantMenuItem.objects.create(restaurant=cls.first_restaurant, product=cls.burger)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post_changes(self, changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/menu/availability/',
+                [
+                    {'restaurant': restaurant.id, 'product': product.id, 'availability': availability}
+                    for restaurant, product, availability in changes
+                ],
+                content_type='application/json',
+            )
+
+    def get_menu(self):
+        return {
+            (menu_item.restaurant_id, menu_item.product_id): menu_item.availability
+            for menu_item in RestaurantMenuItem.objects.all()
+        }
+
+    def test_updates_existing_and_creates_missing_items(self):
+        version = get_catalogue_version()
+        response = self.post_changes([
+            (self.first_restaurant, self.burger, False),
+            (self.first_restaurant, self.fries, True),
+            (self.second_restaurant, self.burger, True),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'updated': 1, 'created': 2})
+        self.assertEqual(self.get_menu(), {
+            (self.first_restaurant.id, self.burger.id): False,
+            (self.first_restaurant.id, self.fries.id): True,
+            (self.second_restaurant.id, self.burger.id): True,
+        })
+        self.assertEqual(
+            dict(Product.objects.values_list('id', 'available_restaurants_count')),
+            {self.burger.id: 1, self.fries.id: 1},
+        )
+        self.assertEqual(get_catalogue_version(), version + 1)
+
+    def test_unchanged_items_do_not_bump_catalogue(self):
+        version = get_catalogue_version()
+        response = self.post_changes([(self.first_restaurant, self.burger, True)])
+        self.assertEqual(response.json(), {'updated': 0, 'created': 0})
+        self.assertEqual(get_catalogue_version(), version)
+
+    def test_unknown_ids_are_rejected(self):
+        unknown_restaurant = Restaurant(id=self.second_restaurant.id + 1)
+        unknown_product = Product(id=self.fries.id + 1)
+        response = self.post_changes([
+            (self.first_restaurant, self.burger, False),
+            (unknown_restaurant, self.burger, True),
+            (self.first_restaurant, unknown_product, True),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [
+            {},
+            {'restaurant': ['Ресторан не найден']},
+            {'product': ['Товар не найден']},
+        ])
+        self.assertEqual(self.get_menu(), {(self.first_restaurant.id, self.burger.id): True})
+
+    def test_only_staff_can_change_menu(self):
+        self.client.logout()
+        response = self.post_changes([(self.first_restaurant, self.burger, False)])
+        self.assertEqual(response.status_code, 403)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cheeseburger = create_product('Чизбургер двойной')
+        cls.fries = create_product('Картофель фри')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_search_ignores_cyrillic_case(self):
+        products = Product.objects.order_by('id')
+        # Короткие слова ищутся через casefold, длинные через FTS5
+        cases = [
+            ('ЧИЗБУРГЕР', [self.cheeseburger]),
+            ('бург', [self.cheeseburger]),
+            ('ФР', [self.fries]),
+            ('ФРИ КАРТ', [self.fries]),
+            ('Р', [self.cheeseburger, self.fries]),
+        ]
+        for search_string, expected in cases:
+            with self.subTest(search_string=search_string):
+                self.assertQuerysetEqual(
+                    search(products, ['name', 'category__name'], search_string),
+                    expected,
+                )
+
+    def test_search_api_uses_catalogue_format(self):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.cheeseburger)
+
+        catalogue = self.client.get('/api/products/').json()
+        found_products = self.client.get('/api/products/search/', {'q': 'чизбург'}).json()
+        self.assertEqual(found_products, catalogue)
+        self.assertEqual(found_products[0]['price'], '100.00')
+        self.assertEqual(self.client.get('/api/products/search/').json(), [])
+
+
+class SearchIndexMigrationTest(TransactionTestCase):
+    def alter_product_description(self, null):
+        old_field = Product._meta.get_field('description')
+        new_field = copy.copy(old_field)
+        new_field.null = null
+        with connection.schema_editor() as schema_editor:
+            schema_editor.alter_field(Product, old_field, new_field)
+
+    def test_search_index_is_kept_after_migrate(self):
+        # На SQLite пересоздание таблицы удаляет триггеры FTS5
+        self.alter_product_description(null=True)
+        try:
+            call_command('migrate', verbosity=0)
+            cheeseburger = create_product('Чизбургер')
+            self.assertQuerysetEqual(
+                search(Product.objects.all(), ['name'], 'чизбургер'),
+                [cheeseburger],
+            )
+        finally:
+            self.alter_product_description(null=False)
+            call_command('migrate', verbosity=0)
+
+
+class RegisterOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [create_product(f'Бургер {number}', 100 + number) for number in range(20)]
+
+    def post_order(self, lines_count):
+        return self.client.post(
+            '/api/order/',
+            {
+                'products': [
+                    {'product': product.id, 'quantity': 2}
+                    for product in self.products[:lines_count]
+                ],
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79001234567',
+                'address': 'Москва, Красная площадь, 1',
+            },
+            content_type='application/json',
+        )
+
+    def test_queries_do_not_depend_on_lines_count(self):
+        for lines_count in [1, 20]:
+            with self.subTest(lines_count=lines_count):
+                with self.assertNumQueries(5):
+                    response = self.post_order(lines_count)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    OrderQuantity.objects.filter(order=response.json()['id']).count(),
+                    lines_count,
+                )
+
+    def test_error_messages(self):
+        response = self.client.post(
+            '/api/order/',
+            {
+                'products': [{'product': 'abc', 'quantity': 1}],
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+7000',
+                'address': 'Москва, Красная площадь, 1',
+            },
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'products': [{'product': ['Некорректный тип. Ожидалось значение первичного ключа, получен str.']}],
+            'phonenumber': ['Введен некорректный номер телефона.'],
+        })
+
+
+class IdempotencyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_product()
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def post_order(self, idempotency_key, quantity=1):
+        return self.client.post(
+            '/api/order/',
+            {
+                'products': [{'product': self.product.id, 'quantity': quantity}],
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79001234567',
+                'address': 'Москва, Красная площадь, 1',
+            },
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=idempotency_key,
+        )
+
+    def post_request(self):
+        return self.factory.post('/order/', {}, HTTP_IDEMPOTENCY_KEY='key')
+
+    def test_replay_returns_stored_response(self):
+        response = self.post_order('key')
+        replayed_response = self.post_order('key')
+
+        self.assertEqual(replayed_response.status_code, response.status_code)
+        self.assertEqual(replayed_response.content, response.content)
+        self.assertEqual(replayed_response['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_other_request_with_same_key_is_rejected(self):
+        self.post_order('key')
+        response = self.post_order('key', quantity=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_in_progress_is_rejected(self):
+        nested_responses = []
+
+        @idempotent
+        def view(request):
+            nested_responses.append(view(self.post_request()))
+            return HttpResponse('ok')
+
+        self.assertEqual(view(self.post_request()).status_code, 200)
+        self.assertEqual(nested_responses[0].status_code, 409)
+
+    def test_server_error_releases_key(self):
+        statuses = [500, 200]
+
+        @idempotent
+        def view(request):
+            return HttpResponse(status=statuses.pop(0))
+
+        self.assertEqual(view(self.post_request()).status_code, 500)
+        response = view(self.post_request())
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class RegisterOrdersBatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_product()
+        cls.partner = User.objects.create_user('partner')
+        cls.partner.user_permissions.add(Permission.objects.get(codename='add_order'))
+
+    def post_batch(self, orders_count):
+        order = {
+            'products': [{'product': self.product.id, 'quantity': 1}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, Красная площадь, 1',
+        }
+        return self.client.post(
+            '/api/orders/batch/',
+            [order] * orders_count,
+            content_type='application/json',
+        )
+
+    def test_anonymous_is_rejected(self):
+        self.assertEqual(self.post_batch(1).status_code, 403)
+        self.assertFalse(Order.objects.exists())
+
+    def test_partner_registers_orders(self):
+        self.client.force_login(self.partner)
+        response = self.post_batch(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 3)
+
+    @override_settings(ORDERS_BATCH_MAX_SIZE=2)
+    def test_batch_size_is_capped(self):
+        self.client.force_login(self.partner)
+        self.assertEqual(self.post_batch(3).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class FilterOrdersTest(TestCase):
+    def test_date_bounds_are_inclusive(self):
+        registered = {
+            'before': datetime(2021, 5, 31, 23, 59, tzinfo=utc),
+            'first_day': datetime(2021, 6, 1, 0, 0, tzinfo=utc),
+            'last_day': datetime(2021, 6, 2, 23, 59, tzinfo=utc),
+            'after': datetime(2021, 6, 3, 0, 0, tzinfo=utc),
+        }
+        orders = {}
+        for name, registered_at in registered.items():
+            orders[name] = create_order()
+            Order.objects.filter(pk=orders[name].pk).update(registered_at=registered_at)
+
+        filtered = filter_orders(since=date(2021, 6, 1), until=date(2021, 6, 2))
+        self.assertQuerysetEqual(
+            filtered.order_by('registered_at'),
+            [orders['first_day'], orders['last_day']],
+        )
+
+
+class OrderAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.products = [create_product(f'Бургер {number}', 100) for number in range(30)]
+
+    def setUp(self):
+        # Тип объекта для ссылки на историю кэшируется на весь процесс
+        ContentType.objects.clear_cache()
+        self.client.force_login(self.admin)
+
+    def create_orders(self, orders_count, lines_count):
+        orders = [create_order() for _ in range(orders_count)]
+        OrderQuantity.objects.bulk_create(
+            OrderQuantity(order=order, product=product, quantity=1, cost=product.price)
+            for order in orders
+            for product in self.products[:lines_count]
+        )
+        return orders
+
+    def test_changelist_queries(self):
+        for orders_count in [5, 30]:
+            with self.subTest(orders_count=orders_count):
+                self.create_orders(orders_count, 3)
+                with self.assertNumQueries(7):
+                    response = self.client.get(reverse('admin:foodcartapp_order_changelist'))
+                self.assertEqual(response.status_code, 200)
+
+    def assert_change_view_queries(self, lines_count):
+        order, = self.create_orders(1, lines_count)
+        with self.assertNumQueries(7):
+            response = self.client.get(
+                reverse('admin:foodcartapp_order_change', args=(order.id,))
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_change_view_queries_for_1_line(self):
+        self.assert_change_view_queries(1)
+
+    def test_change_view_queries_for_30_lines(self):
+        self.assert_change_view_queries(30)
+
+
+class RestaurantAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.products = [create_product(f'Бургер {number}', 100) for number in range(30)]
+
+    def setUp(self):
+        ContentType.objects.clear_cache()
+        self.client.force_login(self.admin)
+
+    def assert_change_view_queries(self, menu_items_count):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for product in self.products[:menu_items_count]
+        )
+        with self.assertNumQueries(8):
+            response = self.client.get(
+                reverse('admin:foodcartapp_restaurant_change', args=(restaurant.id,))
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.products[menu_items_count - 1].name)
+
+    def test_change_view_queries_for_1_menu_item(self):
+        self.assert_change_view_queries(1)
+
+    def test_change_view_queries_for_30_menu_items(self):
+        self.assert_change_view_queries(30)
+
+
+class OrderStatusTest(TestCase):
+    def test_workflow_stamps_transition_times(self):
+        order = create_order()
+        transitions = [
+            (order.confirm, Order.CONFIRMED, 'called_at'),
+            (order.start_cooking, Order.COOKING, 'cooking_started_at'),
+            (order.start_delivery, Order.DELIVERING, 'delivery_started_at'),
+            (order.complete, Order.DONE, 'delivered_at'),
+        ]
+        for advance, status, timestamp_field in transitions:
+            with self.subTest(status=status):
+                self.assertIsNone(getattr(order, timestamp_field))
+                self.assertTrue(advance())
+                self.assertEqual(order.status_order, status)
+                self.assertIsNotNone(getattr(order, timestamp_field))
+        order.refresh_from_db()
+        self.assertEqual(order.status_order, Order.DONE)
+        self.assertLessEqual(order.called_at, order.delivered_at)
+
+    def test_transition_cannot_be_skipped_or_repeated(self):
+        order = create_order()
+        self.assertFalse(order.start_cooking())
+        self.assertFalse(order.complete())
+        self.assertTrue(order.confirm())
+        self.assertFalse(order.confirm())
+
+        order.refresh_from_db()
+        self.assertEqual(order.status_order, Order.CONFIRMED)
+        self.assertIsNone(order.cooking_started_at)
+
+    def test_completed_order_has_no_next_status(self):
+        with self.assertRaises(ValueError):
+            Order.objects.advance_status(Order.DONE)
+
+    def test_admin_action_advances_only_matching_orders(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        new_order = create_order()
+        done_order = create_order(status_order=Order.DONE)
+        self.client.force_login(admin)
+
+        response = self.client.post(
+            reverse('admin:foodcartapp_order_changelist'),
+            {
+                'action': 'confirm_orders',
+                '_selected_action': [new_order.id, done_order.id],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            dict(Order.objects.values_list('id', 'status_order')),
+            {new_order.id: Order.CONFIRMED, done_order.id: Order.DONE},
+        )
+        new_order.refresh_from_db()
+        self.assertIsNotNone(new_order.called_at)
+
+
+class ConfirmOrderRaceTest(TransactionTestCase):
+    workers_count = 8
+
+    def confirm_order(self, order_id, barrier, results):
+        try:
+            order = Order.objects.get(pk=order_id)
+            barrier.wait()
+            while True:
+                try:
+                    results.append(order.confirm())
+                    return
+                except OperationalError:
+                    # SQLite отвечает «database is locked», пока пишет другой поток
+                    time.sleep(0.01)
+        finally:
+            connection.close()
+
+    def test_order_is_confirmed_once(self):
+        order = create_order()
+        barrier = threading.Barrier(self.workers_count)
+        results = []
+        workers = [
+            threading.Thread(target=self.confirm_order, args=(order.id, barrier, results))
+            for _ in range(self.workers_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(results), [False] * (self.workers_count - 1) + [True])
+        order.refresh_from_db()
+        self.assertEqual(order.status_order, Order.CONFIRMED)
+
+
+class ClaimNextOrderTest(TransactionTestCase):
+    workers_count = 8
+    orders_count = 60
+
+    def claim_orders(self, restaurant, claimed_orders):
+        try:
+            while True:
+                try:
+                    order = Order.objects.claim_next(restaurant)
+                except OperationalError:
+                    # SQLite отвечает «database is locked», пока пишет другой поток
+                    time.sleep(0.01)
+                    continue
+                if order is None:
+                    return
+                claimed_orders.append((order.id, restaurant.id))
+        finally:
+            connection.close()
+
+    def test_claim_skips_not_pending_orders(self):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        for _ in range(3):
+            create_order(status_order=Order.DONE)
+        pending_order = create_order()
+
+        self.assertEqual(Order.objects.claim_next(restaurant), pending_order)
+        self.assertIsNone(Order.objects.claim_next(restaurant))
+
+    def test_claim_skips_order_confirmed_after_select(self):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        order = create_order()
+        values_list = OrderQuerySet.values_list
+
+        def confirm_selected_orders(queryset, *args, **kwargs):
+            # Другой менеджер подтверждает заказ между выбором кандидатов и UPDATE
+            order_ids = list(values_list(queryset, *args, **kwargs))
+            Order.objects.filter(pk__in=order_ids).update(status_order=Order.CONFIRMED)
+            return order_ids
+
+        with mock.patch.object(OrderQuerySet, 'values_list', autospec=True,
+                               side_effect=confirm_selected_orders):
+            self.assertIsNone(Order.objects.claim_next(restaurant))
+        order.refresh_from_db()
+        self.assertIsNone(order.restaurant)
+
+    def test_each_order_is_claimed_once(self):
+        restaurants = [
+            Restaurant.objects.create(name=f'Ресторан {number}', address='Москва')
+            for number in range(self.workers_count)
+        ]
+        orders = [create_order() for _ in range(self.orders_count)]
+        claimed_orders = []
+        workers = [
+            threading.Thread(target=self.claim_orders, args=(restaurant, claimed_orders))
+            for restaurant in restaurants
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertCountEqual(
+            [order_id for order_id, restaurant_id in claimed_orders],
+            [order.id for order in orders],
+        )
+        self.assertEqual(
+            dict(claimed_orders),
+            dict(Order.objects.values_list('id', 'restaurant_id')),
+        )
@@ -0,0 +1,70 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+
+RENDITIONS = {
+    'small': (100, 100),
+    'large': (400, 400),
+}
+THUMBNAIL_FORMATS = {
+    'jpeg': 'JPEG',
+}
+if features.check('webp'):
+    THUMBNAIL_FORMATS['webp'] = 'WEBP'
+
+
+def get_thumbnail_name(image_hash, rendition, extension):
+    return f'thumbnails/{image_hash}_{rendition}.{extension}'
+
+
+def get_thumbnail_urls(image_hash):
+    if not image_hash:
+        return None
+    return {
+        rendition: {
+            extension: default_storage.url(get_thumbnail_name(image_hash, rendition, extension))
+            for extension in THUMBNAIL_FORMATS
+        }
+        for rendition in RENDITIONS
+    }
+
+
+def render_thumbnail(image, size, image_format):
+    thumbnail = image.copy()
+    thumbnail.thumbnail(size)
+    if image_format == 'JPEG' and thumbnail.mode != 'RGB':
+        background = Image.new('RGB', thumbnail.size, 'white')
+        thumbnail = thumbnail.convert('RGBA')
+        background.paste(thumbnail, mask=thumbnail.getchannel('A'))
+        thumbnail = background
+    elif image_format == 'WEBP' and thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert('RGBA')
+    output = BytesIO()
+    thumbnail.save(output, image_format, quality=85)
+    return output.getvalue()
+
+
+def generate_thumbnails(image_name):
+    # Не обращается к базе, поэтому годится для пула процессов
+    with default_storage.open(image_name, 'rb') as image_file:
+        content = image_file.read()
+    image_hash = hashlib.sha1(content).hexdigest()[:16]
+
+    image = None
+    for rendition, size in RENDITIONS.items():
+        for extension, image_format in THUMBNAIL_FORMATS.items():
+            thumbnail_name = get_thumbnail_name(image_hash, rendition, extension)
+            if default_storage.exists(thumbnail_name):
+                continue
+            if image is None:
+                image = Image.open(BytesIO(content))
+                image.load()
+            default_storage.save(
+                thumbnail_name,
+                ContentFile(render_thumbnail(image, size, image_format)),
+            )
+    return image_hash
@@ -1,14 +1,18 @@
 from django.urls import path, include
 
-from .views import product_list_api, banners_list_api, register_order
+from .views import product_list_api, banners_list_api, register_order, register_orders_batch
+from .views import product_search_api, update_menu_availability
 
 
 app_name = "foodcartapp"
 
 urlpatterns = [
     path('products/', product_list_api),
+    path('products/search/', product_search_api),
     path('banners/', banners_list_api),
     path('order/', register_order),
+    path('orders/batch/', register_orders_batch),
+    path('menu/availability/', update_menu_availability),
     path('order/', include('rest_framework.urls'))
     
 ]
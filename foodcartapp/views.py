@@ -1,43 +1,110 @@
+import hashlib
+import json
+from functools import lru_cache, partial
 from itertools import product
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse
 
 from django.templatetags.static import static
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import BasePermission, IsAdminUser
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
+from phonenumber_field.serializerfields import PhoneNumberField
 
-from .models import Product, Order, OrderQuantity
-from django.db import transaction
+from .catalogue import get_catalogue_modified_at
+from .catalogue import get_catalogue_version
+from .catalogue import get_serialized_catalogue
+from .catalogue import serialize_products
+from .geocoder import geocoding_queue
+from .idempotency import idempotent
+from .menu import set_menu_availability
+from .parsers import NDJSONParser
+from .search import search
+from .models import Product, Order, OrderQuantity, Restaurant
+from django.db import connection, transaction
 
 
-class ProductSerializer(ModelSerializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
-    quantity = serializers.IntegerField()
-    class Meta:
-        model = Product
-        fields = ['product', 'quantity']
-        extra_kwargs = {
-            'product': {'write_only': True},
-            'quantity': {'write_only': True}
-        }
+PRODUCT_SEARCH_FIELDS = ['name', 'category__name']
+PRODUCT_SEARCH_LIMIT = 20
+
+
+class ProductPrimaryKeyField(serializers.Field):
+    # Ошибки те же, что у PrimaryKeyRelatedField, но товар ищется позже, одним запросом на заказ
+    default_error_messages = {
+        'incorrect_type': serializers.PrimaryKeyRelatedField.default_error_messages['incorrect_type'],
+    }
+
+    def to_internal_value(self, data):
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class ProductSerializer(serializers.Serializer):
+    product = ProductPrimaryKeyField(write_only=True)
+    quantity = serializers.IntegerField(write_only=True)
 
 
-class OrderSerializer(ModelSerializer):
+def build_order_lines(order, positions):
+    return [
+        OrderQuantity(order=order,
+                      product=position['product'],
+                      quantity=position['quantity'],
+                      cost=position['product'].price * position['quantity'])
+        for position in positions
+    ]
+
+
+class OrderSerializer(serializers.Serializer):
+    # Товары можно передать в context["products"], тогда проверка не делает запросов
     products = ProductSerializer(many=True, allow_empty=False, write_only=True)
-    firstname = serializers.CharField(source='first_name')
-    lastname = serializers.CharField(source='last_name')
+    firstname = serializers.CharField(source='first_name', max_length=100)
+    lastname = serializers.CharField(source='last_name', max_length=100)
+    address = serializers.CharField(max_length=200)
+    # Текст ошибки тот же, что давал валидатор модели при ModelSerializer
+    phonenumber = PhoneNumberField(
+        max_length=128,
+        error_messages={'invalid': _('The phone number entered is not valid.')},
+    )
 
-    class Meta:
-        model = Order
-        fields = ['products', 'firstname', 'lastname', 'address', 'phonenumber']
+    def validate_products(self, positions):
+        # Все товары заказа достаются одним запросом вместо запроса на позицию
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.in_bulk(
+                {position['product'] for position in positions}
+            )
+        errors = []
+        for position in positions:
+            if position['product'] in products:
+                errors.append({})
+                continue
+            error_message = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+            errors.append({
+                'product': [error_message.format(pk_value=position['product'])],
+            })
+        if any(errors):
+            raise serializers.ValidationError(errors)
 
+        return [
+            {**position, 'product': products[position['product']]}
+            for position in positions
+        ]
 
-def banners_list_api(request):
+
+@lru_cache(maxsize=None)
+def get_serialized_banners():
     # FIXME move data to db?
-    return JsonResponse([
+    banners = [
         {
             'title': 'Burger',
             'src': static('burger.jpg'),
@@ -53,39 +120,52 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    ]
+    return json.dumps(banners, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def get_banners_etag(request):
+    return hashlib.md5(get_serialized_banners()).hexdigest()
 
 
+def get_catalogue_etag(request):
+    return f'catalogue-{get_catalogue_version()}'
+
+
+def get_catalogue_last_modified(request):
+    return get_catalogue_modified_at()
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=get_banners_etag)
+def banners_list_api(request):
+    return HttpResponse(get_serialized_banners(), content_type='application/json')
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=get_catalogue_etag, last_modified_func=get_catalogue_last_modified)
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return HttpResponse(get_serialized_catalogue(), content_type='application/json')
+
+
+@api_view(['GET'])
+def product_search_api(request):
+    search_string = request.query_params.get('q', '').strip()
+    products = Product.objects.none()
+    if search_string:
+        products = search(
+            Product.objects.select_related('category').available(),
+            PRODUCT_SEARCH_FIELDS,
+            search_string,
+        )
+    # Тот же формат, что у /api/products/: DRF отдал бы цену числом, а не строкой
+    return HttpResponse(
+        serialize_products(products.order_by('name', 'id')[:PRODUCT_SEARCH_LIMIT]),
+        content_type='application/json',
+    )
 
+
+@idempotent
 @transaction.atomic
 @api_view(['POST'])
 def register_order(request):
@@ -96,21 +176,119 @@ def register_order(request):
                                             last_name=serializer.validated_data['last_name'],
                                             address=serializer.validated_data['address'],
                                             phonenumber=serializer.validated_data['phonenumber'],)
-        products = []
-        for position in serializer.validated_data['products']:
-            products.append(position['product'])
-        products_in_order = (
-            Product.objects.filter(name__in=products)
+        OrderQuantity.objects.bulk_create(
+            build_order_lines(created_order, serializer.validated_data['products'])
+        )
+        transaction.on_commit(
+            lambda: geocoding_queue.submit(created_order.address)
         )
-        if products_in_order:
-            objects  = [
-                OrderQuantity(order=created_order,
-                              product=position['product'],
-                              quantity=position['quantity'],
-                              cost=Product.objects.get(name=position['product']).price * position['quantity'])
-                              for position in serializer.validated_data['products']]
-            OrderQuantity.objects.bulk_create(objects)
         order = serializer.data
         order['id'] = created_order.id
         return Response(order)
     return Response(serializer.validated_data)
+
+
+def collect_product_ids(orders_data):
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict) or not isinstance(order_data.get('products'), list):
+            continue
+        for position in order_data['products']:
+            try:
+                product_ids.add(int(position['product']))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return product_ids
+
+
+class IsOrdersPartner(BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        return user.is_authenticated and (user.is_staff or user.has_perm('foodcartapp.add_order'))
+
+
+@api_view(['POST'])
+@parser_classes([JSONParser, NDJSONParser])
+@permission_classes([IsOrdersPartner])
+def register_orders_batch(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list):
+        raise ParseError('Ожидается список заказов')
+    if len(orders_data) > settings.ORDERS_BATCH_MAX_SIZE:
+        raise ParseError(f'В пачке может быть не больше {settings.ORDERS_BATCH_MAX_SIZE} заказов')
+
+    context = {
+        'products': Product.objects.in_bulk(collect_product_ids(orders_data)),
+    }
+
+    results = []
+    valid_orders = []
+    for order_data in orders_data:
+        serializer = OrderSerializer(data=order_data, context=context)
+        if not serializer.is_valid():
+            results.append({'errors': serializer.errors})
+            continue
+        result = {}
+        results.append(result)
+        valid_orders.append((serializer.validated_data, result))
+
+    with transaction.atomic():
+        orders = [
+            Order(first_name=validated_data['first_name'],
+                  last_name=validated_data['last_name'],
+                  address=validated_data['address'],
+                  phonenumber=validated_data['phonenumber'])
+            for validated_data, result in valid_orders
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders, batch_size=1000)
+        else:
+            for order in orders:
+                order.save()
+
+        order_lines = []
+        for order, (validated_data, result) in zip(orders, valid_orders):
+            order_lines.extend(build_order_lines(order, validated_data['products']))
+            result['id'] = order.id
+        OrderQuantity.objects.bulk_create(order_lines, batch_size=1000)
+
+        for order in orders:
+            transaction.on_commit(partial(geocoding_queue.submit, order.address))
+
+    return Response(results)
+
+
+class MenuItemAvailabilitySerializer(serializers.Serializer):
+    restaurant = serializers.IntegerField()
+    product = serializers.IntegerField()
+    availability = serializers.BooleanField()
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def update_menu_availability(request):
+    serializer = MenuItemAvailabilitySerializer(data=request.data, many=True)
+    serializer.is_valid(raise_exception=True)
+    changes = serializer.validated_data
+
+    restaurant_ids = set(Restaurant.objects.filter(
+        id__in={change['restaurant'] for change in changes}
+    ).values_list('id', flat=True))
+    product_ids = set(Product.objects.filter(
+        id__in={change['product'] for change in changes}
+    ).values_list('id', flat=True))
+    errors = []
+    for change in changes:
+        error = {}
+        if change['restaurant'] not in restaurant_ids:
+            error['restaurant'] = ['Ресторан не найден']
+        if change['product'] not in product_ids:
+            error['product'] = ['Товар не найден']
+        errors.append(error)
+    if any(errors):
+        raise serializers.ValidationError(errors)
+
+    return Response(set_menu_availability(
+        ((change['restaurant'], change['product']), change['availability'])
+        for change in changes
+    ))
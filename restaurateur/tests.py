@@ -1,3 +1,207 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from foodcartapp.models import (
+    CoordinateAddress,
+    Order,
+    OrderQuantity,
+    Product,
+    Restaurant,
+    RestaurantMenuItem,
+)
+
+
+@override_settings(GEOCODER_BACKEND='foodcartapp.geocoder.LocalGeocoder')
+class ViewOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='manager', is_staff=True)
+        cls.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100, image='burger.png')
+            for number in range(5)
+        ]
+        for number in range(3):
+            restaurant = Restaurant.objects.create(
+                name=f'Ресторан {number}',
+                address=f'Москва, ул. Ресторанная, {number}',
+                latitude=55.75,
+                longitude=37.62,
+            )
+            RestaurantMenuItem.objects.bulk_create(
+                RestaurantMenuItem(restaurant=restaurant, product=product)
+                for product in cls.products
+            )
+
+    def create_orders(self, count):
+        orders = Order.objects.bulk_create(
+            Order(
+                first_name='Иван',
+                last_name='Петров',
+                phonenumber='+79001234567',
+                address=f'Москва, ул. Заказная, {number}',
+                payment_method='C',
+            )
+            for number in range(count)
+        )
+        orders = Order.objects.order_by('id')
+        OrderQuantity.objects.bulk_create(
+            OrderQuantity(order=order, product=product, quantity=1, cost=product.price)
+            for order in orders
+            for product in self.products[:3]
+        )
+        CoordinateAddress.objects.bulk_create(
+            CoordinateAddress(address=order.address, latitude=55.7, longitude=37.6)
+            for order in orders
+        )
+
+    def assert_orders_page_queries(self, orders_count):
+        self.create_orders(orders_count)
+        self.client.force_login(self.manager)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('restaurateur:view_orders'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.context['orders']),
+            min(orders_count, 50),
+        )
+
+    @override_settings(ORDERS_PAGE_SIZE=50)
+    def test_queries_for_10_orders(self):
+        self.assert_orders_page_queries(10)
+
+    @override_settings(ORDERS_PAGE_SIZE=50)
+    def test_queries_for_500_orders(self):
+        self.assert_orders_page_queries(500)
+
+
+class AssignOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='manager', is_staff=True)
+        cls.restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+        self.order = Order.objects.create(
+            first_name='Иван',
+            last_name='Петров',
+            phonenumber='+79001234567',
+            address='Москва, Красная площадь, 1',
+            payment_method='C',
+        )
+
+    def test_assign_order(self):
+        response = self.client.post(
+            reverse('restaurateur:assign_order', args=(self.order.id,)),
+            {'restaurant': self.restaurant.id},
+        )
+        self.assertRedirects(response, reverse('restaurateur:view_orders'))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.restaurant, self.restaurant)
+
+    def test_invalid_restaurant_is_rejected(self):
+        for restaurant in ['abc', '', self.restaurant.id + 1]:
+            with self.subTest(restaurant=restaurant):
+                response = self.client.post(
+                    reverse('restaurateur:assign_order', args=(self.order.id,)),
+                    {'restaurant': restaurant},
+                )
+                self.assertEqual(response.status_code, 400)
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.restaurant)
+
+    def test_claim_next_order(self):
+        response = self.client.post(
+            reverse('restaurateur:claim_next_order'),
+            {'restaurant': self.restaurant.id},
+        )
+        self.assertRedirects(response, reverse('restaurateur:view_orders'))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.restaurant, self.restaurant)
+
+
+class ConfirmOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='manager', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def confirm(self, order):
+        response = self.client.post(reverse('restaurateur:confirm_order', args=(order.id,)))
+        self.assertRedirects(response, reverse('restaurateur:view_orders'))
+        order.refresh_from_db()
+
+    def test_confirm_new_order(self):
+        order = Order.objects.create(
+            first_name='Иван',
+            last_name='Петров',
+            phonenumber='+79001234567',
+            address='Москва, Красная площадь, 1',
+            payment_method='C',
+        )
+        self.confirm(order)
+        self.assertEqual(order.status_order, Order.CONFIRMED)
+        self.assertIsNotNone(order.called_at)
+
+    def test_confirmed_order_is_not_changed(self):
+        order = Order.objects.create(
+            first_name='Иван',
+            last_name='Петров',
+            phonenumber='+79001234567',
+            address='Москва, Красная площадь, 1',
+            payment_method='C',
+            status_order=Order.COOKING,
+        )
+        self.confirm(order)
+        self.assertEqual(order.status_order, Order.COOKING)
+        self.assertIsNone(order.called_at)
+
+    def test_get_is_not_allowed(self):
+        response = self.client.get(reverse('restaurateur:confirm_order', args=(1,)))
+        self.assertEqual(response.status_code, 405)
+
+
+class ViewProductsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='manager', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_menu(self, products_count, restaurants_count):
+        Product.objects.bulk_create(
+            Product(name=f'Бургер {number}', price=100, image='burger.png')
+            for number in range(products_count)
+        )
+        Restaurant.objects.bulk_create(
+            Restaurant(name=f'Ресторан {number}', address=f'Москва, {number}')
+            for number in range(restaurants_count)
+        )
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in Restaurant.objects.all()
+            for product in Product.objects.all()
+        )
+
+    def assert_products_page_queries(self, products_count, restaurants_count):
+        self.create_menu(products_count, restaurants_count)
+        self.client.force_login(self.manager)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('restaurateur:ProductsView'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products_with_restaurants']), products_count)
+        self.assertTrue(all(
+            all(availability)
+            for product, availability in response.context['products_with_restaurants']
+        ))
+
+    def test_queries_for_small_menu(self):
+        self.assert_products_page_queries(3, 2)
+
+    def test_queries_for_large_menu(self):
+        self.assert_products_page_queries(200, 30)
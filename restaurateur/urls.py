@@ -9,11 +9,16 @@ urlpatterns = [
     path('', lambda request: redirect('restaurateur:ProductsView')),
 
     path('products/', views.view_products, name="ProductsView"),
+    path('products/availability/', views.update_menu_availability, name="update_menu_availability"),
 
     path('restaurants/', views.view_restaurants, name="RestaurantView"),
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/export/', views.export_orders, name="export_orders"),
+    path('orders/claim/', views.claim_next_order, name="claim_next_order"),
+    path('orders/<int:order_id>/confirm/', views.confirm_order, name="confirm_order"),
+    path('orders/<int:order_id>/assign/', views.assign_order, name="assign_order"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
@@ -1,16 +1,27 @@
+from datetime import datetime
+
 from django import forms
-from django.shortcuts import redirect, render
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.views import View
+from django.views.decorators.http import require_POST
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
+from django.utils.dateparse import parse_date
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 
+from foodcartapp.catalogue import get_availability_matrix
+from foodcartapp.distances import calculate_distances
+from foodcartapp.eligibility import find_capable_restaurants
+from foodcartapp.export import EXPORT_FORMATS, filter_orders, iter_orders_with_items
+from foodcartapp.geocoder import fetch_coordinates, geocoding_queue
+from foodcartapp.menu import set_menu_availability
 from foodcartapp.models import *
-from geopy import distance
-from geopy.geocoders import *
 
 
 class Login(forms.Form):
@@ -30,6 +41,33 @@ class Login(forms.Form):
     )
 
 
+class MenuAvailabilityForm(forms.Form):
+    restaurants = forms.ModelMultipleChoiceField(
+        label='Рестораны',
+        queryset=Restaurant.objects.order_by('name'),
+        widget=forms.SelectMultiple(attrs={'class': 'form-control', 'size': 8}),
+    )
+    products = forms.ModelMultipleChoiceField(
+        label='Товары',
+        queryset=Product.objects.order_by('name'),
+        widget=forms.SelectMultiple(attrs={'class': 'form-control', 'size': 8}),
+    )
+    availability = forms.TypedChoiceField(
+        label='Действие',
+        choices=[('1', 'Вернуть в продажу'), ('0', 'Поставить на стоп')],
+        coerce=lambda value: value == '1',
+        widget=forms.RadioSelect,
+    )
+
+
+class AssignRestaurantForm(forms.Form):
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан',
+        queryset=Restaurant.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -68,17 +106,14 @@ def is_manager(user):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
     restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    products = list(Product.objects.select_related('category'))
+    availability = get_availability_matrix(restaurant.id for restaurant in restaurants)
 
-    default_availability = {restaurant.id: False for restaurant in restaurants}
+    restaurants_bits = [1 << index for index in range(len(restaurants))]
     products_with_restaurants = []
     for product in products:
-
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id] for restaurant in restaurants]
+        product_availability = availability.get(product.id, 0)
+        orderer_availability = [bool(product_availability & bit) for bit in restaurants_bits]
 
         products_with_restaurants.append(
             (product, orderer_availability)
@@ -87,9 +122,23 @@ def view_products(request):
     return render(request, template_name="products_list.html", context={
         'products_with_restaurants': products_with_restaurants,
         'restaurants': restaurants,
+        'availability_form': MenuAvailabilityForm(),
     })
 
 
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def update_menu_availability(request):
+    form = MenuAvailabilityForm(request.POST)
+    if form.is_valid():
+        set_menu_availability(
+            ((restaurant.id, product.id), form.cleaned_data['availability'])
+            for restaurant in form.cleaned_data['restaurants']
+            for product in form.cleaned_data['products']
+        )
+    return redirect('restaurateur:ProductsView')
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
@@ -97,31 +146,135 @@ def view_restaurants(request):
     })
 
 
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def confirm_order(request, order_id):
+    order = get_object_or_404(Order, pk=order_id)
+    # Если заказ уже подтвердил другой менеджер, повторно он не переводится
+    order.confirm()
+    return redirect('restaurateur:view_orders')
+
+
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def assign_order(request, order_id):
+    order = get_object_or_404(Order, pk=order_id)
+    form = AssignRestaurantForm(request.POST)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Неизвестный ресторан')
+    # Если ресторан уже назначил другой менеджер, назначение не меняется
+    order.assign_restaurant(form.cleaned_data['restaurant'])
+    return redirect('restaurateur:view_orders')
+
+
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def claim_next_order(request):
+    form = AssignRestaurantForm(request.POST)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Неизвестный ресторан')
+    Order.objects.claim_next(form.cleaned_data['restaurant'])
+    return redirect('restaurateur:view_orders')
+
+
+def encode_orders_cursor(order):
+    cursor = f'{order.registered_at.isoformat()}|{order.id}'
+    return urlsafe_base64_encode(cursor.encode())
+
+
+def decode_orders_cursor(cursor):
+    try:
+        registered_at, order_id = urlsafe_base64_decode(cursor).decode().split('|')
+        registered_at = datetime.fromisoformat(registered_at)
+        order_id = int(order_id)
+    except ValueError:
+        return None
+    return registered_at, order_id
+
+
+def sort_restaurants_by_distance(restaurants, distances):
+    # Рестораны без координат идут в конце с расстоянием None
+    restaurants = {restaurant.id: restaurant for restaurant in restaurants}
+    sorted_restaurants = [
+        (restaurants.pop(restaurant_id), restaurant_distance)
+        for restaurant_id, restaurant_distance in distances
+        if restaurant_id in restaurants
+    ]
+    sorted_restaurants.extend(
+        (restaurant, None)
+        for restaurant in sorted(restaurants.values(), key=lambda restaurant: restaurant.name)
+    )
+    return sorted_restaurants
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = OrderQuantity.objects.cost_order().filter(order__status_order='N')
-    geolocator = ArcGIS()
+    orders = (
+        Order.objects
+        .pending()
+        .with_total_cost()
+        .select_related('restaurant')
+        .prefetch_related('in_order_quantity')
+        .order_by('registered_at', 'id')
+    )
+    cursor = decode_orders_cursor(request.GET.get('after', ''))
+    if cursor:
+        orders = orders.registered_after(*cursor)
+    orders = list(orders[:settings.ORDERS_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(orders) > settings.ORDERS_PAGE_SIZE:
+        orders = orders[:settings.ORDERS_PAGE_SIZE]
+        next_cursor = encode_orders_cursor(orders[-1])
+
+    capable_restaurants = find_capable_restaurants({
+        order.id: {item.product_id for item in order.in_order_quantity.all()}
+        for order in orders
+    })
+
+    restaurants = Restaurant.objects.in_bulk()
+    coordinates = fetch_coordinates(order.address for order in orders)
+    distances = calculate_distances(
+        {
+            order.id: coordinates[order.address]
+            for order in orders
+            if order.address in coordinates
+        },
+        {
+            restaurant.id: restaurant.coordinates
+            for restaurant in restaurants.values()
+            if restaurant.coordinates
+        },
+    )
     for order in orders:
-        try:
-            obj = CoordinateAddress.objects.get(address=order.order.address,)
-        except CoordinateAddress.DoesNotExist:
-            coords_order = geolocator.geocode(order.order.address)
-            obj = CoordinateAddress(address=order.order.address,
-                                        latitude=coords_order.latitude,
-                                        longitude=coords_order.longitude)
-            obj.save()
-        pos = Order.objects.filter(id=order.id).prefetch_related('products').values_list('products')
-        pos_in_restaurant = (
-            list(RestaurantMenuItem.objects.filter(product__in=pos)
-                                      .filter(availability=True)
-                                      .values('restaurant__address','product__name'))
+        order.restaurants = sort_restaurants_by_distance(
+            [restaurants[restaurant_id] for restaurant_id in capable_restaurants[order.id]],
+            distances.get(order.id, []),
         )
-        for restaurans in pos_in_restaurant:
-            coords_rest = geolocator.geocode(restaurans['restaurant__address'])
-            restaurans['distance'] = distance.distance(
-                (obj.latitude, obj.longitude),
-                (coords_rest.latitude, coords_rest.longitude)).km
-        order.restaurant = pos_in_restaurant
     return render(request, template_name='order_items.html', context={
-        'order_items': orders
+        'orders': orders,
+        'is_first_page': not cursor,
+        'next_cursor': next_cursor,
+        'geocoding_stats': geocoding_queue.stats,
+        'claim_form': AssignRestaurantForm(),
     })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def export_orders(request):
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    try:
+        since = parse_date(request.GET.get('since', ''))
+        until = parse_date(request.GET.get('until', ''))
+    except ValueError:
+        return HttpResponseBadRequest('Некорректная дата')
+
+    orders = filter_orders(since, until, request.GET.get('status'))
+    render_rows, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        render_rows(iter_orders_with_items(orders)),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+    return response